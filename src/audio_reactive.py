@@ -0,0 +1,280 @@
+import numpy as np
+import queue
+import threading
+import time
+import wave
+from light_sources import *
+
+# Audio Constants
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_BLOCK_SIZE = 1024
+DEFAULT_BANDS = {'low':(20,250),'mid':(250,2000),'high':(2000,16000)}
+DEFAULT_PEAK_DECAY = 0.995
+DEFAULT_NOISE_FLOOR_DB = -60
+DEFAULT_ONSET_THRESHOLD = 1.5
+DEFAULT_ONSET_HISTORY = 43
+DEFAULT_ONSET_GAP = 5
+MIN_ONSET_FLUX = 1e-4
+OUTPUT_TIMEOUT = 0.5
+# Mappings
+AUDIO_FIXTURE_TO_ID_DICT = dict(FIXTURE_TO_ID_DICT,strobe=STROBE_ID,sound=SOUND_ID)
+DEFAULT_AUDIO_MAPPING = {'dimmer':'low','red':'low','green':'mid',
+                         'blue':'high','white':'onset'}
+PCM_DTYPES = {1:np.uint8,2:np.int16,4:np.int32}
+
+
+
+
+class WavSource:
+    """
+    Audio source reading a PCM WAV file block by block. The
+    file is played at its natural speed, so that the lights
+    follow the music as if it was coming from a live stream.
+
+    """
+    def __init__(self,path:str,block_size:int=DEFAULT_BLOCK_SIZE,realtime:bool=True):
+        """
+        Open the WAV file.
+
+        :param path: Path to the WAV file.
+        :param block_size: Number of samples per block.
+        :param realtime: If set to True, blocks are delivered at the file sample rate.
+
+        """
+        self.file = wave.open(path,'rb')
+        self.sample_width = self.file.getsampwidth()
+        if self.sample_width not in PCM_DTYPES:
+            raise ValueError(f'Unsupported WAV sample width: {8*self.sample_width} bits')
+        self.sample_rate = self.file.getframerate()
+        self.n_channels = self.file.getnchannels()
+        self.block_size = block_size
+        self.realtime = realtime
+        self.block_duration = block_size/self.sample_rate
+        self.next_block_time = None
+
+    def read_block(self):
+        """ Return the next mono block in [-1,1], or None once the file is exhausted. """
+        frames = self.file.readframes(self.block_size)
+        if len(frames) == 0:
+            return None
+        samples = np.frombuffer(frames,dtype=PCM_DTYPES[self.sample_width]).astype(np.float32)
+        if self.sample_width == 1:
+            samples -= 128
+        samples /= float(2**(8*self.sample_width-1))
+        block = samples.reshape(-1,self.n_channels).mean(axis=1)
+        if len(block) < self.block_size:
+            block = np.pad(block,(0,self.block_size-len(block)))
+        if self.realtime:
+            now = time.perf_counter()
+            if self.next_block_time is None:
+                self.next_block_time = now
+            time.sleep(max(0,self.next_block_time-now))
+            self.next_block_time += self.block_duration
+        return block
+
+    def close(self):
+        """ Close the WAV file. """
+        self.file.close()
+
+
+class StreamSource:
+    """
+    Audio source reading blocks from a local input device
+    (microphone, line-in or loopback). Requires the optional
+    sounddevice package.
+
+    """
+    def __init__(self,block_size:int=DEFAULT_BLOCK_SIZE,sample_rate:int=DEFAULT_SAMPLE_RATE,device=None):
+        """
+        Open the input stream.
+
+        :param block_size: Number of samples per block.
+        :param sample_rate: Sampling rate of the stream.
+        :param device: Identifier of the input device, default device if None.
+
+        """
+        try:
+            import sounddevice
+        except ImportError:
+            raise ImportError('Reading a live audio stream requires the sounddevice package.')
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.stream = sounddevice.InputStream(samplerate=sample_rate,blocksize=block_size,
+                                              device=device,channels=1,dtype='float32')
+        self.stream.start()
+
+    def read_block(self):
+        """ Return the next mono block in [-1,1]. Blocks until it is available. """
+        block, _ = self.stream.read(self.block_size)
+        return block[:,0]
+
+    def close(self):
+        """ Stop and close the input stream. """
+        self.stream.stop()
+        self.stream.close()
+
+
+class AudioAnalyzer:
+    """
+    Block audio analyzer. Computes normalized band energies
+    and onsets (spectral flux) of each block with a single FFT.
+    All per-band quantities are precomputed so that a block
+    only costs a few array operations.
+
+    """
+    def __init__(self,sample_rate:int,block_size:int,bands:dict=DEFAULT_BANDS,
+                 peak_decay:float=DEFAULT_PEAK_DECAY,onset_threshold:float=DEFAULT_ONSET_THRESHOLD,
+                 onset_history:int=DEFAULT_ONSET_HISTORY,onset_gap:int=DEFAULT_ONSET_GAP,
+                 noise_floor_db:float=DEFAULT_NOISE_FLOOR_DB):
+        """
+        Instantiate the analyzer.
+
+        :param sample_rate: Sampling rate of the audio blocks.
+        :param block_size: Number of samples per block.
+        :param bands: Mapping between band name and (low,high) frequency range in Hz.
+        :param peak_decay: Decay factor of the running peak used to normalize band energies.
+        :param onset_threshold: Ratio of the spectral flux to its recent mean above which
+                                an onset is detected.
+        :param onset_history: Number of past blocks used to compute the mean spectral flux.
+                              No onset is detected before this history is filled.
+        :param onset_gap: Minimum number of blocks between two onsets.
+        :param noise_floor_db: Band energy, relative to a full scale sine, below which
+                               the band level is 0 and no onset is detected.
+
+        """
+        self.band_names = list(bands.keys())
+        self.window = np.hanning(block_size).astype(np.float32)
+        frequencies = np.fft.rfftfreq(block_size,d=1/sample_rate)
+        ranges = np.array(list(bands.values()),dtype=np.float64)
+        self.band_matrix = ((frequencies >= ranges[:,:1]) & (frequencies < ranges[:,1:])).astype(np.float32)
+        self.peak_decay = peak_decay
+        full_scale_energy = (self.window.sum()/2)**2
+        self.noise_floor = full_scale_energy*10**(noise_floor_db/10)
+        self.peaks = np.full(len(bands),self.noise_floor,dtype=np.float32)
+        self.onset_threshold = onset_threshold
+        self.flux_history = np.zeros(onset_history,dtype=np.float32)
+        self.flux_index = 0
+        self.flux_count = 0
+        self.onset_gap = onset_gap
+        self.blocks_since_onset = onset_gap
+        self.prev_magnitude = np.zeros(len(frequencies),dtype=np.float32)
+
+    def analyze(self,block:np.ndarray) -> dict:
+        """
+        Analyze an audio block.
+
+        :param block: Mono audio block of size block_size.
+        :return: Dictionnary with each band level in [0,1], the overall
+                 'level' and 'onset' set to 1.0 if an onset was detected.
+
+        """
+        magnitude = np.abs(np.fft.rfft(block*self.window)).astype(np.float32)
+        energies = self.band_matrix @ (magnitude*magnitude)
+        self.peaks = np.maximum(np.maximum(energies,self.peaks*self.peak_decay),self.noise_floor)
+        levels = np.where(energies > self.noise_floor,energies/self.peaks,0)
+        flux = np.maximum(magnitude-self.prev_magnitude,0).sum()/len(magnitude)
+        self.prev_magnitude = magnitude
+        onset = (self.flux_count >= len(self.flux_history) and self.blocks_since_onset >= self.onset_gap
+                 and flux > MIN_ONSET_FLUX and flux > self.onset_threshold*self.flux_history.mean()
+                 and energies.sum() > self.noise_floor)
+        self.blocks_since_onset = 0 if onset else self.blocks_since_onset+1
+        self.flux_history[self.flux_index] = flux
+        self.flux_index = (self.flux_index+1) % len(self.flux_history)
+        self.flux_count += 1
+        features = dict(zip(self.band_names,levels.tolist()))
+        features['level'] = float(levels.mean())
+        features['onset'] = 1.0 if onset else 0.0
+        return features
+
+
+class AudioReactiveEngine:
+    """
+    Audio reactive engine. An analysis worker reads blocks from
+    the audio source and publishes the latest features, while an
+    output worker maps them to the fixtures of the light sources.
+    Slow DMX writes therefore never delay the analysis, and the
+    output always uses the most recent features.
+
+    """
+    def __init__(self,source,light_object_dict:dict,mappings:dict,bands:dict=DEFAULT_BANDS):
+        """
+        Create the engine.
+
+        :param source: Audio source, e.g. WavSource or StreamSource.
+        :param light_object_dict: Dictionnary with light source name as key and
+                                  corresponding light object as value.
+        :param mappings: Dictionnary with light source name as key and a mapping
+                         {fixture name: feature name} as value. Fixture names are
+                         those of AUDIO_FIXTURE_TO_ID_DICT, feature names are the band
+                         names, 'level' or 'onset'.
+        :param bands: Mapping between band name and (low,high) frequency range in Hz.
+
+        """
+        for name, mapping in mappings.items():
+            if name not in light_object_dict:
+                raise ValueError(f'Unknown light source {name} in the audio mappings')
+            for fixture, feature in mapping.items():
+                if fixture not in AUDIO_FIXTURE_TO_ID_DICT:
+                    raise ValueError(f'Unknown fixture {fixture} in the mapping of {name}')
+                if feature not in bands and feature not in ('level','onset'):
+                    raise ValueError(f'Unknown audio feature {feature} in the mapping of {name}')
+        self.source = source
+        self.analyzer = AudioAnalyzer(source.sample_rate,source.block_size,bands)
+        self.targets = [(light_object_dict[name],
+                         [(AUDIO_FIXTURE_TO_ID_DICT[fixture],feature) for fixture,feature in mapping.items()])
+                        for name, mapping in mappings.items()]
+        self.features = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.workers = [threading.Thread(target=self.analysis_process,daemon=True),
+                        threading.Thread(target=self.output_process,daemon=True)]
+
+    def publish(self,features:dict):
+        """ Replace the pending features by the latest ones. """
+        try:
+            self.features.get_nowait()
+        except queue.Empty:
+            pass
+        self.features.put_nowait(features)
+
+    def analysis_process(self):
+        """ Analysis worker, reading and analyzing audio blocks until stopped. """
+        try:
+            while not self.stop_event.is_set():
+                block = self.source.read_block()
+                if block is None:
+                    break
+                self.publish(self.analyzer.analyze(block))
+        finally:
+            self.stop_event.set()
+
+    def output_process(self):
+        """ Output worker, writing the latest features to the lights until stopped. """
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    features = self.features.get(timeout=OUTPUT_TIMEOUT)
+                except queue.Empty:
+                    continue
+                for light_object, mapping in self.targets:
+                    for fixture_id, feature in mapping:
+                        value = int(round(255*min(max(features[feature],0.0),1.0)))
+                        if light_object.state[fixture_id-1] != value:
+                            light_object.set_fixture_value(fixture_id,value)
+        finally:
+            self.stop_event.set()
+
+    def start(self):
+        """ Start the analysis and output workers. """
+        for worker in self.workers:
+            worker.start()
+
+    def is_running(self) -> bool:
+        """ Return True while the audio source is being played. """
+        return not self.stop_event.is_set()
+
+    def stop(self):
+        """ Stop the workers and close the audio source. """
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join()
+        self.source.close()
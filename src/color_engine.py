@@ -0,0 +1,231 @@
+import numpy as np
+from light_sources import *
+
+# Color Constants
+DEFAULT_LUT_SIZE = 17
+DEFAULT_GAMMA = 2.2
+SOLVER_ITERATIONS = 2000
+SOLVER_INITIAL_COST_WEIGHT = 1e-2
+SOLVER_FINAL_COST_WEIGHT = 1e-7
+MIN_TEMPERATURE = 1000
+MAX_TEMPERATURE = 40000
+COLOR_FIXTURES = ['red','green','blue','white','amber','uv']
+# Fixture Profiles: linear RGB contribution of each emitter at full power and
+# relative cost of using it. Cheap emitters (white, amber) are preferred
+# whenever they can reproduce the target color. UV costs less than the
+# red+blue mix it replaces (0.42), so that it is used for violet colors.
+FIXTURE_PROFILES = {'default':{'emitters':{'red':(1.0,0.0,0.0),'green':(0.0,1.0,0.0),
+                                           'blue':(0.0,0.0,1.0),'white':(1.0,1.0,1.0),
+                                           'amber':(1.0,0.45,0.0),'uv':(0.12,0.0,0.3)},
+                               'costs':{'red':1.0,'green':1.0,'blue':1.0,'white':0.2,
+                                        'amber':0.5,'uv':0.35}}}
+# Cache
+LUT_CACHE = {}
+
+
+
+
+def solve_emitters(profile:dict,targets:np.ndarray) -> np.ndarray:
+    """
+    Find the emitter levels reproducing the target colors. Solved for all
+    targets at once with an accelerated projected gradient descent on a bounded
+    least squares problem, regularized by the emitter costs. The cost weight
+    decays geometrically along the iterations: it first selects the cheapest
+    emitters, then only breaks ties so that the target color is reached exactly.
+
+    :param profile: Fixture profile, see FIXTURE_PROFILES.
+    :param targets: Array of shape (N,3) of linear RGB colors in [0,1].
+    :return: Array of shape (N,6) of emitter levels in [0,1], ordered as COLOR_FIXTURES.
+
+    """
+    mixing = np.array([profile['emitters'][name] for name in COLOR_FIXTURES],dtype=np.float64)
+    costs = np.array([profile['costs'][name] for name in COLOR_FIXTURES])
+    cost_weights = np.geomspace(SOLVER_INITIAL_COST_WEIGHT,SOLVER_FINAL_COST_WEIGHT,SOLVER_ITERATIONS)
+    gram = mixing @ mixing.T
+    step = 1/(2*np.linalg.eigvalsh(gram).max())
+    levels = np.zeros((len(targets),len(COLOR_FIXTURES)))
+    momentum_levels = levels
+    projected_targets = targets @ mixing.T
+    for i, cost_weight in enumerate(cost_weights):
+        gradient = 2*(momentum_levels @ gram - projected_targets) + cost_weight*costs
+        new_levels = np.clip(momentum_levels-step*gradient,0,1)
+        momentum_levels = new_levels + i/(i+3)*(new_levels-levels)
+        levels = new_levels
+    return levels
+
+def build_lut(profile:dict,lut_size:int=DEFAULT_LUT_SIZE) -> np.ndarray:
+    """
+    Build the 3D lookup table from linear RGB to emitter levels. Since the
+    emitters mix linearly, interpolating between grid points reproduces the
+    target color up to the 8-bit rounding of each emitter. The split between
+    emitters is only approximated near the colors where the cheapest emitters
+    change: on 2000 random colors, it differs from solve_emitters by 0.2 DMX
+    step on average and up to 26 steps on one emitter, and a larger table
+    does not reduce this maximum (24 steps with 33 grid points).
+
+    :param profile: Fixture profile, see FIXTURE_PROFILES.
+    :param lut_size: Number of grid points along each RGB axis.
+    :return: Array of shape (lut_size,lut_size,lut_size,6) of emitter levels in [0,1].
+
+    """
+    axis = np.linspace(0,1,lut_size)
+    grid = np.stack(np.meshgrid(axis,axis,axis,indexing='ij'),axis=-1).reshape(-1,3)
+    levels = solve_emitters(profile,grid)
+    return levels.reshape(lut_size,lut_size,lut_size,len(COLOR_FIXTURES))
+
+def get_lut(profile_name:str,lut_size:int=DEFAULT_LUT_SIZE) -> np.ndarray:
+    """ Return the lookup table of the fixture profile, building it on first use only. """
+    key = (profile_name,lut_size)
+    if key not in LUT_CACHE:
+        LUT_CACHE[key] = build_lut(FIXTURE_PROFILES[profile_name],lut_size)
+    return LUT_CACHE[key]
+
+def emitters_to_rgb(values:list,profile_name:str='default',gamma:float=DEFAULT_GAMMA) -> list:
+    """
+    Approximate the RGB color displayed by the emitters, e.g. for a preview in the UI.
+
+    :param values: List of DMX values of the emitters, ordered as COLOR_FIXTURES.
+    :param profile_name: Name of the fixture profile in FIXTURE_PROFILES.
+    :param gamma: Gamma of the returned RGB values.
+    :return: List of RGB values in [0,255].
+
+    """
+    profile = FIXTURE_PROFILES[profile_name]
+    mixing = np.array([profile['emitters'][name] for name in COLOR_FIXTURES])
+    linear = np.clip((np.asarray(values,dtype=np.float64)/255) @ mixing,0,1)
+    return np.rint(255*linear**(1/gamma)).astype(int).tolist()
+
+def hsv_to_rgb(colors:np.ndarray) -> np.ndarray:
+    """
+    Convert HSV colors to RGB.
+
+    :param colors: Array of shape (N,3) with hue in [0,360], saturation and value in [0,1].
+    :return: Array of shape (N,3) of RGB colors in [0,255].
+
+    """
+    colors = np.asarray(colors,dtype=np.float64).reshape(-1,3)
+    h, s, v = colors[:,0]/60, colors[:,1], colors[:,2]
+    k = (np.array([5,3,1])+h[:,None]) % 6
+    rgb = v[:,None] - v[:,None]*s[:,None]*np.clip(np.minimum(k,4-k),0,1)
+    return 255*rgb
+
+def temperature_to_rgb(temperatures:np.ndarray) -> np.ndarray:
+    """
+    Convert color temperatures to RGB, using Tanner Helland's
+    approximation of the black body radiation.
+
+    :param temperatures: Array of shape (N,) of temperatures in Kelvin.
+    :return: Array of shape (N,3) of RGB colors in [0,255].
+
+    """
+    t = np.clip(np.asarray(temperatures,dtype=np.float64).reshape(-1),MIN_TEMPERATURE,MAX_TEMPERATURE)/100
+    warm = t <= 66
+    red = np.where(warm,255,329.698727446*np.power(np.maximum(t-60,1e-9),-0.1332047592))
+    green = np.where(warm,99.4708025861*np.log(t)-161.1195681661,
+                     288.1221695283*np.power(np.maximum(t-60,1e-9),-0.0755148492))
+    blue = np.where(t >= 66,255,np.where(t <= 19,0,138.5177312231*np.log(np.maximum(t-10,1e-9))-305.0447927307))
+    return np.clip(np.stack([red,green,blue],axis=1),0,255)
+
+
+class ColorEngine:
+    """
+    Color engine converting target colors to the full set of
+    color emitters of a fixture (red, green, blue, white, amber, UV).
+    The conversion is a tetrahedral interpolation in a precomputed
+    3D lookup table, shared by all engines using the same profile.
+
+    """
+    def __init__(self,profile_name:str='default',lut_size:int=DEFAULT_LUT_SIZE,gamma:float=DEFAULT_GAMMA):
+        """
+        Instantiate the color engine.
+
+        :param profile_name: Name of the fixture profile in FIXTURE_PROFILES.
+        :param lut_size: Number of grid points along each RGB axis of the lookup table.
+        :param gamma: Gamma of the input RGB values.
+
+        """
+        if profile_name not in FIXTURE_PROFILES:
+            raise ValueError(f'Unknown fixture profile: {profile_name}')
+        self.lut = get_lut(profile_name,lut_size)
+        self.lut_size = lut_size
+        self.gamma = gamma
+
+    def convert_rgb(self,colors) -> np.ndarray:
+        """
+        Convert RGB colors to emitter values.
+
+        :param colors: RGB color or array of shape (N,3) of RGB colors in [0,255].
+        :return: Array of shape (N,6) of DMX values, ordered as COLOR_FIXTURES.
+
+        """
+        linear = (np.clip(np.asarray(colors,dtype=np.float64).reshape(-1,3),0,255)/255)**self.gamma
+        position = linear*(self.lut_size-1)
+        low = np.minimum(position.astype(int),self.lut_size-2)
+        weight = position-low
+        # Tetrahedral interpolation: walk from the low to the high corner of the cell,
+        # along the axes sorted by decreasing weight
+        order = np.argsort(-weight,axis=1)
+        sorted_weight = np.take_along_axis(weight,order,axis=1)
+        steps = np.eye(3,dtype=int)[order]
+        vertex = low.copy()
+        levels = (1-sorted_weight[:,0:1])*self.lut[vertex[:,0],vertex[:,1],vertex[:,2]]
+        for i in range(3):
+            vertex += steps[:,i]
+            next_weight = sorted_weight[:,i+1:i+2] if i < 2 else 0
+            levels += (sorted_weight[:,i:i+1]-next_weight)*self.lut[vertex[:,0],vertex[:,1],vertex[:,2]]
+        return np.rint(255*levels).astype(np.uint8)
+
+    def convert_hsv(self,colors) -> np.ndarray:
+        """ Convert HSV colors (hue in [0,360], saturation and value in [0,1]) to emitter values. """
+        return self.convert_rgb(hsv_to_rgb(colors))
+
+    def convert_temperature(self,temperatures) -> np.ndarray:
+        """ Convert color temperatures in Kelvin to emitter values. """
+        return self.convert_rgb(temperature_to_rgb(temperatures))
+
+    def apply(self,light_objects:list,values:np.ndarray):
+        """
+        Set the color fixtures of each light source to the converted values.
+
+        :param light_objects: List of light sources.
+        :param values: Array of shape (N,6) returned by one of the convert methods,
+                       one row per light source or a single row for all of them.
+
+        """
+        if len(values) == 1:
+            values = np.repeat(values,len(light_objects),axis=0)
+        if len(values) != len(light_objects):
+            raise ValueError('The number of colors must be equal to 1 or to the number of light sources')
+        for light_object, light_values in zip(light_objects,values.tolist()):
+            light_object.set_rgbwauv(light_values)
+
+    def set_rgb(self,light_objects:list,colors):
+        """ Set the light sources to the given RGB colors, converted in a single call. """
+        self.apply(light_objects,self.convert_rgb(colors))
+
+    def set_hsv(self,light_objects:list,colors):
+        """ Set the light sources to the given HSV colors, converted in a single call. """
+        self.apply(light_objects,self.convert_hsv(colors))
+
+    def set_temperature(self,light_objects:list,temperatures):
+        """ Set the light sources to the given color temperatures, converted in a single call. """
+        self.apply(light_objects,self.convert_temperature(temperatures))
+
+    def set_group_rgb(self,group:Group,colors):
+        """
+        Set each light of the group to its own RGB color, or all to the same one.
+        With one color per light, the group state holds their mean value.
+
+        :param group: Group of lights.
+        :param colors: RGB color or array of shape (number of lights,3) of RGB colors in [0,255].
+
+        """
+        values = self.convert_rgb(colors)
+        if len(values) == 1:
+            group.set_rgbwauv(values[0].tolist())
+            return
+        self.apply(group.lights,values)
+        new_state = group.state.copy()
+        for fixture_id, value in zip(COLOR_FIXTURE_IDS,np.rint(values.mean(axis=0)).astype(int).tolist()):
+            new_state[fixture_id-1] = value
+        group.state = new_state
@@ -7,6 +7,7 @@ import pyautogui
 import json
 from PIL import ImageGrab
 from light_sources import *
+from color_engine import *
 
 # Setup Constants
 DEFAULT_PACKET_SIZE = 512
@@ -202,7 +203,7 @@ def update_sliders(window:sg.Window, light_object:LightSource):
 def update_button(window:sg.Window, light_object:LightSource):
     """ Update the button with the light source state. """
     button_id = light_object.name
-    hex_color = sg.rgb(*light_object.state[RED_ID-1:BLUE_ID])
+    hex_color = sg.rgb(*emitters_to_rgb([light_object.state[fixture_id-1] for fixture_id in COLOR_FIXTURE_IDS]))
     window[button_id].update(button_color=hex_color)
 
 def update_buttons(window:sg.Window, light_object_dict:dict):
@@ -302,6 +303,7 @@ def UI_process(ip:str,light_object_dict:dict,presets:dict,presets_path:str):
     window.bind('<Motion>', 'Motion')
     position = pyautogui.position()
     light_object = None
+    color_engine = ColorEngine()
     while True:
         # Update GUI
         event, values = window.read(timeout=1000)
@@ -323,7 +325,7 @@ def UI_process(ip:str,light_object_dict:dict,presets:dict,presets_path:str):
             e = window.user_bind_event
             pixel = ImageGrab.grab(bbox=(
                 e.x_root, e.y_root, e.x_root+1, e.y_root+1)).getdata()[0]
-            light_object.set_rgb(pixel)
+            color_engine.set_rgb([light_object],pixel[:3])
             update_sliders(window,light_object)
             update_button(window,light_object)
         elif event in LIGHT_FIXTURE_EVENTS and light_object != None:
@@ -17,6 +17,7 @@ AMBER_ID = 8
 UV_ID = 9
 PRESET_ID = 10
 SOUND_ID = 11
+COLOR_FIXTURE_IDS = [RED_ID,GREEN_ID,BLUE_ID,WHITE_ID,AMBER_ID,UV_ID]
 DEFAULT_LIGHT_VALUE = [255]+[0]*(DEFAULT_CHANNEL_WIDTH-1)
 RESET_VALUE = [0]*DEFAULT_CHANNEL_WIDTH
 LIGHT_OFF_VALUE = RESET_VALUE
@@ -51,6 +52,8 @@ class Channel:
         self.channel_start = channel_start
         self.channel_width = channel_width
         self.offset = self.channel_start - 1
+        self.output_stage = None
+        self.output_slot = None
 
     def set_value(self,fixture_id:int,value:int,show=True):
         """
@@ -63,12 +66,38 @@ class Channel:
         """
         if value < 0 or value > 255:
             raise ValueError(f'The value for {ID_TO_FIXTURE_DICT[fixture_id]} should be contained in [0,255]')
+        if self.output_stage is not None and fixture_id in (DIMMER_ID,DIMMER_FINE_ID):
+            # Dimmer slots are rendered by the output stage at each frame
+            if fixture_id == DIMMER_ID:
+                self.output_stage.set_intensity(self.output_slot,value*257)
+            return
         self.server.set_single_value(self.offset+fixture_id,value)
+        if self.output_stage is not None:
+            # The universe is sent by the frame worker of the output stage
+            return
         time.sleep(0.002)
         if show:
             self.server.show()
         time.sleep(0.002)
 
+    def set_intensity(self,value:int,fade_time:int=0):
+        """
+        Set the 16-bit intensity of the dimmer and fine dimmer fixtures.
+
+        :param value: Intensity, should be contained in [0,65535].
+        :param fade_time: Duration of the fade in ms. Fades and dimmer curves
+                          require the channel to be attached to an output stage,
+                          otherwise the intensity is set immediately.
+        
+        """
+        if self.output_stage is not None:
+            self.output_stage.set_intensity(self.output_slot,value,fade_time)
+            return
+        if value < 0 or value > 65535:
+            raise ValueError('The intensity should be contained in [0,65535]')
+        self.server.set_16bit(self.offset+DIMMER_ID,value,high_first=True)
+        self.server.show()
+
     def set_values(self,values:list):
         """
         Set all the fixtures of the channel to the given list of values.
@@ -78,7 +107,15 @@ class Channel:
         """
         if len(values) != self.channel_width:
             raise ValueError(f'The list of values sent by the channel must be of size equal to the channel width: {self.channel_width}')
+        if self.output_stage is not None:
+            # Restore the full 16-bit intensity, the dimmer slots are skipped below.
+            # A zero fine value (e.g. legacy presets) matches set_value, i.e. coarse*257
+            coarse, fine = values[DIMMER_ID-1], values[DIMMER_FINE_ID-1]
+            intensity = coarse << 8 | fine if fine != 0 else coarse*257
+            self.output_stage.set_intensity(self.output_slot,intensity)
         for fixture_id, value in enumerate(values):
+            if self.output_stage is not None and fixture_id+1 in (DIMMER_ID,DIMMER_FINE_ID):
+                continue
             self.set_value(fixture_id+1, value, show=False)
 
     def set_values_(self,values:list):
@@ -112,9 +149,15 @@ class LightSource:
     def blink():
         """ Make the Light Source Blink. """
 
+    def set_intensity(self, value:int, fade_time:int=0):
+        """ Define the 16-bit intensity. """
+
     def set_rgb(self, values:list):
         """ Define the RGB values. """
 
+    def set_rgbwauv(self, values:list):
+        """ Define the RGB, white, amber and UV values. """
+
     def turn_off(self):
         """ Turn off the Light Source"""
 
@@ -157,6 +200,9 @@ class Light(LightSource):
         """
         new_state = self.state.copy()
         new_state[fixture_id-1] = value
+        if fixture_id == DIMMER_ID and self.channel.output_stage is not None:
+            # The output stage renders value*257, i.e. the fine byte equals value
+            new_state[DIMMER_FINE_ID-1] = value
         self.channel.set_value(fixture_id, value)
         self.state = new_state
 
@@ -171,6 +217,21 @@ class Light(LightSource):
         new_state = values
         self.state = new_state
 
+    def set_intensity(self,value:int,fade_time:int=0):
+        """
+        Set the dimmer to the given 16-bit intensity, split over the dimmer
+        and fine dimmer fixtures.
+
+        :param value: Intensity, should be contained in [0,65535].
+        :param fade_time: Duration of the fade in ms.
+        
+        """
+        self.channel.set_intensity(value,fade_time)
+        new_state = self.state.copy()
+        new_state[DIMMER_ID-1] = value >> 8
+        new_state[DIMMER_FINE_ID-1] = value & 0xFF
+        self.state = new_state
+
     def set_rgb(self, values:list):
         """
         Set the RGB fixtures to the color code given in values.
@@ -181,6 +242,17 @@ class Light(LightSource):
         for idx, fixture_id in enumerate([RED_ID,GREEN_ID,BLUE_ID]):
             self.set_fixture_value(fixture_id,values[idx])
 
+    def set_rgbwauv(self, values:list):
+        """
+        Set all color fixtures to the values given by the color engine.
+
+        :param values: List containing the values for the red, green, blue,
+                       white, amber and UV fixtures.
+        
+        """
+        for idx, fixture_id in enumerate(COLOR_FIXTURE_IDS):
+            self.set_fixture_value(fixture_id,values[idx])
+
     def blink(self,blink_time=0.2,n_repeat=2):
         """ """
         prev_state = self.state.copy()
@@ -279,6 +351,8 @@ class Group(LightSource):
         for l in self.lights:
             l.set_fixture_value(fixture_id,value)
         new_state[fixture_id-1] = value
+        if fixture_id == DIMMER_ID and any(l.channel.output_stage is not None for l in self.lights):
+            new_state[DIMMER_FINE_ID-1] = value
         self.state = new_state
 
     def set_fixture_values(self,values=[]):
@@ -293,6 +367,21 @@ class Group(LightSource):
         new_state = values
         self.state = new_state
 
+    def set_intensity(self,value:int,fade_time:int=0):
+        """
+        Set the dimmer of all lights in the group to the given 16-bit intensity.
+
+        :param value: Intensity, should be contained in [0,65535].
+        :param fade_time: Duration of the fade in ms.
+        
+        """
+        new_state = self.state.copy()
+        for l in self.lights:
+            l.set_intensity(value,fade_time)
+        new_state[DIMMER_ID-1] = value >> 8
+        new_state[DIMMER_FINE_ID-1] = value & 0xFF
+        self.state = new_state
+
     def set_rgb(self, values:list):
         """
         Set the RGB fixtures to the color code given in values.
@@ -303,6 +392,17 @@ class Group(LightSource):
         for idx, fixture_id in enumerate([RED_ID,GREEN_ID,BLUE_ID]):
             self.set_fixture_value(fixture_id,values[idx])
 
+    def set_rgbwauv(self, values:list):
+        """
+        Set all color fixtures to the values given by the color engine.
+
+        :param values: List containing the values for the red, green, blue,
+                       white, amber and UV fixtures.
+        
+        """
+        for idx, fixture_id in enumerate(COLOR_FIXTURE_IDS):
+            self.set_fixture_value(fixture_id,values[idx])
+
     def blink(self):
         """ Make all lights in the group blink. """
         for l in self.lights:
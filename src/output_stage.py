@@ -0,0 +1,149 @@
+import numpy as np
+import threading
+import time
+from stupidArtnet import StupidArtnet
+from light_sources import *
+
+# Output Constants
+DEFAULT_FPS = 40
+DEFAULT_DIMMER_CURVE = 'linear'
+MAX_INTENSITY = 65535
+# Dimmer response curves, mapping logical intensity in [0,1] to output in [0,1]
+DIMMER_CURVES = {'linear':lambda x: x,
+                 'square':lambda x: x*x,
+                 'square_root':lambda x: np.sqrt(x),
+                 's_curve':lambda x: x*x*(3-2*x)}
+CURVE_NAMES = list(DIMMER_CURVES.keys())
+
+
+
+
+def build_curve_table() -> np.ndarray:
+    """
+    Build the lookup table of all dimmer curves.
+
+    :return: Array of shape (number of curves, 65536) mapping each logical
+             16-bit intensity to the 16-bit output of each curve.
+
+    """
+    x = np.arange(MAX_INTENSITY+1,dtype=np.float64)/MAX_INTENSITY
+    table = np.stack([DIMMER_CURVES[name](x) for name in CURVE_NAMES])
+    return np.rint(MAX_INTENSITY*table).astype(np.uint16)
+
+CURVE_TABLE = build_curve_table()
+
+
+class OutputStage:
+    """
+    Output stage of a universe. It owns the dimmer and fine dimmer
+    slots of the channels attached to it: their logical 16-bit
+    intensities and fades are rendered once per frame, through the
+    dimmer curve of each channel, with a single lookup over all of
+    them before the universe is sent.
+
+    """
+    def __init__(self,server:StupidArtnet,fps:int=DEFAULT_FPS):
+        """
+        Instantiate the output stage.
+
+        :param server: ArtNet server of the universe.
+        :param fps: Number of frames rendered per second.
+
+        """
+        self.server = server
+        self.frame_time = 1/fps
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self.frame_process,daemon=True)
+        self.curves = np.zeros(0,dtype=np.intp)
+        self.coarse_ids = np.zeros(0,dtype=np.intp)
+        self.fine_ids = np.zeros(0,dtype=np.intp)
+        self.fade_from = np.zeros(0,dtype=np.float64)
+        self.fade_to = np.zeros(0,dtype=np.float64)
+        self.fade_start = np.zeros(0,dtype=np.float64)
+        self.fade_duration = np.ones(0,dtype=np.float64)
+
+    def add_channel(self,channel:Channel,curve:str=DEFAULT_DIMMER_CURVE,intensity:int=0):
+        """
+        Attach a channel to the output stage, which will then handle its dimmer slots.
+
+        :param channel: ArtNet channel object. Must be bound to the server of the output stage.
+        :param curve: Name of the dimmer curve, see DIMMER_CURVES.
+        :param intensity: Initial logical intensity, contained in [0,65535].
+
+        """
+        if channel.server is not self.server:
+            raise ValueError('The channel must be bound to the server of the output stage')
+        if curve not in DIMMER_CURVES:
+            raise ValueError(f'Unknown dimmer curve: {curve}')
+        with self.lock:
+            channel.output_slot = len(self.curves)
+            channel.output_stage = self
+            self.curves = np.append(self.curves,CURVE_NAMES.index(curve))
+            self.coarse_ids = np.append(self.coarse_ids,channel.offset+DIMMER_ID-1)
+            self.fine_ids = np.append(self.fine_ids,channel.offset+DIMMER_FINE_ID-1)
+            self.fade_from = np.append(self.fade_from,intensity)
+            self.fade_to = np.append(self.fade_to,intensity)
+            self.fade_start = np.append(self.fade_start,0)
+            self.fade_duration = np.append(self.fade_duration,1)
+
+    def set_curve(self,slot:int,curve:str):
+        """ Set the dimmer curve of the channel attached at the given slot. """
+        if curve not in DIMMER_CURVES:
+            raise ValueError(f'Unknown dimmer curve: {curve}')
+        with self.lock:
+            self.curves[slot] = CURVE_NAMES.index(curve)
+
+    def get_intensity(self,slot:int,now:float=None) -> float:
+        """ Return the current logical intensity of the channel attached at the given slot. """
+        now = time.perf_counter() if now is None else now
+        progress = min(max((now-self.fade_start[slot])/self.fade_duration[slot],0),1)
+        return self.fade_from[slot] + (self.fade_to[slot]-self.fade_from[slot])*progress
+
+    def set_intensity(self,slot:int,intensity:int,fade_time:int=0):
+        """
+        Set the logical intensity of the channel attached at the given slot.
+
+        :param slot: Slot of the channel in the output stage.
+        :param intensity: Target logical intensity, contained in [0,65535].
+        :param fade_time: Duration of the fade from the current intensity, in ms.
+
+        """
+        if intensity < 0 or intensity > MAX_INTENSITY:
+            raise ValueError(f'The intensity should be contained in [0,{MAX_INTENSITY}]')
+        with self.lock:
+            now = time.perf_counter()
+            self.fade_from[slot] = self.get_intensity(slot,now)
+            self.fade_to[slot] = intensity
+            self.fade_start[slot] = now
+            self.fade_duration[slot] = max(fade_time/1000,1e-9)
+
+    def render(self):
+        """ Render the dimmer slots of all attached channels and send the universe. """
+        with self.lock:
+            progress = np.clip((time.perf_counter()-self.fade_start)/self.fade_duration,0,1)
+            intensities = np.rint(self.fade_from + (self.fade_to-self.fade_from)*progress).astype(np.intp)
+            output = CURVE_TABLE[self.curves,intensities]
+            buffer = np.frombuffer(self.server.buffer,dtype=np.uint8)
+            buffer[self.coarse_ids] = output >> 8
+            buffer[self.fine_ids] = output & 0xFF
+        self.server.show()
+
+    def frame_process(self):
+        """ Frame worker, rendering the universe at the configured frame rate until stopped. """
+        next_frame = time.perf_counter()
+        while not self.stop_event.is_set():
+            self.render()
+            next_frame += self.frame_time
+            self.stop_event.wait(max(0,next_frame-time.perf_counter()))
+
+    def start(self):
+        """ Start the frame worker. """
+        self.worker.start()
+
+    def stop(self):
+        """ Stop the frame worker, after rendering a last frame. """
+        self.stop_event.set()
+        if self.worker.is_alive():
+            self.worker.join()
+        self.render()
@@ -1,6 +1,9 @@
 from stupidArtnet import StupidArtnet
+import argparse
 import json
 from helpers import *
+from audio_reactive import *
+from output_stage import *
 
 # Setup Constants
 DEFAULT_PACKET_SIZE = 512
@@ -18,12 +21,46 @@ DEFAULT_IP = '169.254.79.148'
 PRESET_BUTTON_PREFIX = 'preset_group_'
 
 
+#### Setup
+def create_light_object_dict(server:StupidArtnet, num_lights:int, groups_mapping:dict,
+                             channel_width:int, output_stage:OutputStage=None,
+                             dimmer_curve:str=DEFAULT_DIMMER_CURVE) -> dict:
+    """
+    Create the lights and groups bound to the ArtNet server.
+
+    :param server: ArtNet server to communicate with the lights.
+    :param num_lights: Number of lights to be configured. 
+    :param groups_mapping: Mapping between group name and set of lights.
+    :param channel_width: Number of fixtures per channel.
+    :param output_stage: Output stage rendering the dimmers, if any.
+    :param dimmer_curve: Dimmer curve of the lights attached to the output stage.
+    :return: Dictionnary with event_id as key and corresponding light object as value.
+
+    """
+    # Lights
+    lights = []
+    for i in range(num_lights):
+        channel_start = DEFAULT_CHANNEL_START_ID + i*channel_width
+        lights.append(Light(name='light_'+str(i+1),channel=Channel(server,channel_start,channel_width)))
+        if output_stage is not None:
+            output_stage.add_channel(lights[-1].channel,dimmer_curve,lights[-1].state[DIMMER_ID-1]*257)
+    # Groups
+    groups = []
+    for group_name, group_lights_names in groups_mapping.items():
+        group_lights = [l for l in lights if l.name in group_lights_names]
+        groups.append(Group(name=group_name, lights=group_lights))
+    # light Object Mapping
+    light_object_dict = [('group_'+str(i+1),groups[i]) for i in range(len(groups))]
+    light_object_dict.extend([('light_'+str(i+1),lights[i]) for i in range(num_lights)])
+    light_object_dict = dict(light_object_dict)
+    return light_object_dict
+
 #### Pipeline
 def live_color_picker(ip:str=DEFAULT_IP, num_lights:int=DEFAULT_LIGHT_NUM, groups_mapping=DEFAULT_GROUPS,
                       packet_size=DEFAULT_PACKET_SIZE, fps=DEFAULT_FPS,
                       even_packet_size = ENFORCE_EVEN_PACKET, broadcast=ENFORCE_BROADCAST,
                       universe_id=DEFAULT_UNIVERSE_ID,channel_width=DEFAULT_CHANNEL_WIDTH,
-                      presets_path=PRESETS_PATH):
+                      presets_path=PRESETS_PATH, dimmer_curve=DEFAULT_DIMMER_CURVE):
     """
     Pipeline to select color of each light source in real time.
 
@@ -38,27 +75,83 @@ def live_color_picker(ip:str=DEFAULT_IP, num_lights:int=DEFAULT_LIGHT_NUM, group
     :param universe_id: Identifier of the universe with which we want to communicate.
     :param channel_width: Number of fixtures per channel.
     :param presets_path: Path to the JSON file containing the presets.
+    :param dimmer_curve: Response curve of the dimmers, see DIMMER_CURVES.
     
     """
     # Init connections
     server = StupidArtnet(ip,universe_id,packet_size,fps,even_packet_size,broadcast)
     with open(PRESETS_PATH,'r') as file:
         presets = json.load(file)
-   # Lights
-    lights = []
-    for i in range(num_lights):
-        channel_start = DEFAULT_CHANNEL_START_ID + i*channel_width
-        lights.append(Light(name='light_'+str(i+1),channel=Channel(server,channel_start,channel_width)))
-    # Groups
-    groups = []
-    for group_name, group_lights_names in groups_mapping.items():
-        group_lights = [l for l in lights if l.name in group_lights_names]
-        groups.append(Group(name=group_name, lights=group_lights))
-    # light Object Mapping
-    light_object_dict = [('group_'+str(i+1),groups[i]) for i in range(len(groups))]
-    light_object_dict.extend([('light_'+str(i+1),lights[i]) for i in range(num_lights)])
-    light_object_dict = dict(light_object_dict)
+    output_stage = OutputStage(server,fps)
+    light_object_dict = create_light_object_dict(server,num_lights,groups_mapping,channel_width,
+                                                 output_stage,dimmer_curve)
+    output_stage.start()
     # UI Loop
     UI_process(ip,light_object_dict,presets,presets_path)
+    output_stage.stop()
+
+def live_audio_reactive(audio_path:str=None, ip:str=DEFAULT_IP, num_lights:int=DEFAULT_LIGHT_NUM,
+                        groups_mapping=DEFAULT_GROUPS, audio_mappings:dict=None,
+                        block_size:int=DEFAULT_BLOCK_SIZE, packet_size=DEFAULT_PACKET_SIZE,
+                        fps=DEFAULT_FPS, even_packet_size=ENFORCE_EVEN_PACKET,
+                        broadcast=ENFORCE_BROADCAST, universe_id=DEFAULT_UNIVERSE_ID,
+                        channel_width=DEFAULT_CHANNEL_WIDTH, dimmer_curve=DEFAULT_DIMMER_CURVE):
+    """
+    Pipeline driving the lights from an audio stream until it ends
+    or the user interrupts it.
+
+    :param audio_path: Path to a WAV file. If None, the default audio
+                       input device is used instead.
+    :param ip: Ip of the ArtNet receiving device.
+    :param num_lights: Number of lights to be configured. 
+    :param groups_mapping: Mapping between group name and set of lights.
+    :param audio_mappings: Mapping between light source name and {fixture: audio feature}.
+                           By default, every group follows DEFAULT_AUDIO_MAPPING.
+    :param block_size: Number of audio samples analyzed at once.
+    :param packet_size: Size of ArtNet packets.
+    :param fps: Refresh rate of the server.
+    :param even_packet_size: Boolean variable to enforce even packets (May be
+                             required by the receiver).
+    :param broadcast: Boolean variable to allow broadcast in the subnet.
+    :param universe_id: Identifier of the universe with which we want to communicate.
+    :param channel_width: Number of fixtures per channel.
+    :param dimmer_curve: Response curve of the dimmers, see DIMMER_CURVES.
+    
+    """
+    # Init connections
+    server = StupidArtnet(ip,universe_id,packet_size,fps,even_packet_size,broadcast)
+    output_stage = OutputStage(server,fps)
+    light_object_dict = create_light_object_dict(server,num_lights,groups_mapping,channel_width,
+                                                 output_stage,dimmer_curve)
+    output_stage.start()
+    if audio_mappings is None:
+        audio_mappings = dict([(name,DEFAULT_AUDIO_MAPPING) for name,light_object in light_object_dict.items()
+                               if isinstance(light_object,Group)])
+    # Audio Loop
+    source = WavSource(audio_path,block_size) if audio_path is not None else StreamSource(block_size)
+    engine = AudioReactiveEngine(source,light_object_dict,audio_mappings)
+    engine.start()
+    try:
+        while engine.is_running():
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    engine.stop()
+    for light_object in light_object_dict.values():
+        light_object.turn_off()
+    output_stage.stop()
 
-live_color_picker()
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Light control pipelines.')
+    parser.add_argument('pipeline',nargs='?',choices=['color_picker','audio'],default='color_picker',
+                        help='Pipeline to run, the live color picker by default.')
+    parser.add_argument('--wav',default=None,help='WAV file played by the audio pipeline. '
+                        'If not given, the default audio input device is used.')
+    parser.add_argument('--ip',default=DEFAULT_IP,help='Ip of the ArtNet receiving device.')
+    parser.add_argument('--dimmer-curve',default=DEFAULT_DIMMER_CURVE,choices=CURVE_NAMES,
+                        help='Response curve of the dimmers.')
+    args = parser.parse_args()
+    if args.pipeline == 'audio':
+        live_audio_reactive(audio_path=args.wav,ip=args.ip,dimmer_curve=args.dimmer_curve)
+    else:
+        live_color_picker(ip=args.ip,dimmer_curve=args.dimmer_curve)
\ No newline at end of file